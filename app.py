@@ -5,71 +5,147 @@
 import os
 import pandas as pd
 import streamlit as st
-import plotly.express as px
-from openai import OpenAI
-from fpdf import FPDF
 import time
+import hashlib
 import datetime
-import plotly.io as pio
 from dotenv import load_dotenv
+# Plotly, OpenAI and FPDF are imported by the pages that use them, to keep cold start light
 
 # --- CONFIG & THEMING ---
 load_dotenv()
 
-DATA_FILE = "quality_data.csv"
+DATA_FILE = "quality_data.parquet"
+LEGACY_CSV_FILE = "quality_data.csv"  # migrated to DATA_FILE on first run
+MONTH_ORDER = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
+MONTH_DTYPE = pd.CategoricalDtype(MONTH_ORDER, ordered=True)  # groupby yields calendar order
+DATA_DTYPES = {"Month": MONTH_DTYPE, "Category": "category", "Cost": "int64", "Description": "string"}
+
+# Minified CSS and header HTML, sent to the browser in a single markdown block
+STYLE_AND_HEADER = (
+    "<style>"
+    ".main{background-color:#121212;padding:2rem}"
+    ".title-container{background:linear-gradient(90deg,#0f172a,#000000);color:white;padding:20px 30px;"
+    "border-radius:12px;box-shadow:0px 4px 10px rgba(0,0,0,0.2);text-align:center}"
+    ".title-container h1{font-size:2.3rem;margin-bottom:0}"
+    ".title-container p{font-size:1rem;opacity:0.9}"
+    "[data-testid=\"stMetricValue\"]{color:#00bcd4;font-weight:700}"
+    ".suggestion-box{background-color:#fff;border-left:5px solid #2563eb;padding:15px;"
+    "border-radius:8px;box-shadow:0 2px 5px rgba(0,0,0,0.05)}"
+    "</style>"
+    "<div class='title-container'>"
+    "<h1>📊 Smart Quality Cost Monitoring Dashboard</h1>"
+    "<p>Analyze, track, and improve your quality costs using TQM principles & AI insights.</p>"
+    "</div>"
+)
+
+# --- DATA LOADING ---
+def read_data_csv(source):
+    # Validate before casting so bad files fail with a readable message instead of a dtype error
+    df = pd.read_csv(source, engine="pyarrow")  # multithreaded parser
+    missing = [col for col in ["Month", "Category", "Cost"] if col not in df.columns]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+    df = df.reindex(columns=list(DATA_DTYPES))  # Description is optional, extra columns are dropped
+    unknown = df.loc[~df["Month"].isin(MONTH_ORDER), "Month"].unique()
+    if len(unknown):
+        raise ValueError(f"unknown month(s): {', '.join(map(str, unknown))} (expected {', '.join(MONTH_ORDER)})")
+    # Casting to int64 would silently truncate fractional costs, so reject them explicitly
+    cost = pd.to_numeric(df["Cost"], errors="coerce")
+    if cost.isna().any() or (cost % 1 != 0).any():
+        raise ValueError("every Cost must be a whole number")
+    return df.astype(DATA_DTYPES)
+
+@st.cache_data(show_spinner=False)
+def load_data(path, mtime):
+    # mtime is only part of the cache key, so edits to the file invalidate it
+    return pd.read_parquet(path)
+
+def save_data(df):
+    # Parquet keeps the column dtypes, so reloads need no re-parsing or casting
+    df.astype(DATA_DTYPES).to_parquet(DATA_FILE, compression="snappy", index=False)
+    load_data.clear()
+
+def migrate_legacy_csv():
+    # Older versions saved rows read_data_csv now rejects; skip those instead of failing startup
+    df = pd.read_csv(LEGACY_CSV_FILE, engine="pyarrow").reindex(columns=list(DATA_DTYPES))
+    cost = pd.to_numeric(df["Cost"], errors="coerce")
+    valid = df["Month"].isin(MONTH_ORDER) & df["Category"].notna() & (cost % 1 == 0)
+    save_data(df[valid].assign(Cost=cost[valid]))
+    return int((~valid).sum())
+
+def set_data(df):
+    # Fingerprint each data version once; it is the cache key for the aggregations below
+    st.session_state["data"] = df
+    st.session_state["data_key"] = (len(df), int(pd.util.hash_pandas_object(df, index=False).sum()))
+
+@st.cache_data(show_spinner=False)
+def category_sums(key, _df):
+    return _df.groupby("Category", observed=True)["Cost"].sum().to_dict()
+
+@st.cache_data(show_spinner=False)
+def month_sums(key, _df):
+    # Month is an ordered categorical, so groups already come out in calendar order
+    return _df.groupby("Month", observed=True)["Cost"].sum()
+
+def quality_costs(sums):
+    # Returns (COGQ, COPQ) from the per-category sums
+    return (sums.get("Prevention", 0) + sums.get("Appraisal", 0),
+            sums.get("Internal Failure", 0) + sums.get("External Failure", 0))
+
+# --- CHART BUILDERS ---
+def set_chart_theme():
+    import plotly.io as pio
+    pio.templates.default = "seaborn"  # professional chart color theme
+
+# Figures are cached on the aggregated values, so reruns that don't change the data skip Plotly Express
+@st.cache_resource(show_spinner=False)
+def build_kpi_fig(cogq, copq):
+    import plotly.express as px
+    kpi_df = pd.DataFrame({"Category": ["Good Quality (COGQ)", "Poor Quality (COPQ)"],
+                           "Cost": [cogq, copq]})
+    return px.bar(kpi_df, x="Category", y="Cost", color="Category",
+                  text_auto=True, title="COGQ vs COPQ Comparison",
+                  color_discrete_sequence=px.colors.qualitative.Safe)
+
+@st.cache_resource(show_spinner=False)
+def build_pie_fig(categories, costs):
+    import plotly.express as px
+    return px.pie(names=list(categories), values=list(costs),
+                  color_discrete_sequence=px.colors.qualitative.Safe)
+
+@st.cache_resource(show_spinner=False)
+def build_line_fig(months, costs):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scatter(x=list(months), y=list(costs), mode="lines+markers", line_shape="linear"))
+    fig.update_layout(title="Total Quality Cost per Month", xaxis_title="Month", yaxis_title="Cost")
+    return fig
+
 if "data" not in st.session_state:
+    if not os.path.exists(DATA_FILE) and os.path.exists(LEGACY_CSV_FILE):
+        try:
+            st.session_state["migration_dropped"] = migrate_legacy_csv()
+        except Exception as e:
+            st.session_state["migration_error"] = str(e)
     if os.path.exists(DATA_FILE):
-        st.session_state["data"] = pd.read_csv(DATA_FILE)
+        set_data(load_data(DATA_FILE, os.path.getmtime(DATA_FILE)))
     else:
-        st.session_state["data"] = pd.DataFrame(columns=["Month", "Category", "Cost", "Description"])
+        set_data(pd.DataFrame(columns=["Month", "Category", "Cost", "Description"]).astype(DATA_DTYPES))
+    # Rows already stored, so new records can be de-duplicated without rescanning the whole dataset
+    st.session_state["row_hashes"] = set(st.session_state["data"].itertuples(index=False, name=None))
 
 st.set_page_config(page_title="Smart Quality Dashboard", page_icon="📊", layout="wide")
-pio.templates.default = "seaborn"  # professional chart color theme
-
-# --- CUSTOM CSS STYLING ---
-st.markdown("""
-    <style>
-        .main {
-            background-color: #121212;
-            padding: 2rem;
-        }
-        .title-container {
-            background: linear-gradient(90deg, #0f172a, #000000);
-            color: white;
-            padding: 20px 30px;
-            border-radius: 12px;
-            box-shadow: 0px 4px 10px rgba(0,0,0,0.2);
-            text-align: center;
-        }
-        .title-container h1 {
-            font-size: 2.3rem;
-            margin-bottom: 0;
-        }
-        .title-container p {
-            font-size: 1rem;
-            opacity: 0.9;
-        }
-        [data-testid="stMetricValue"] {
-            color: #00bcd4;  
-            font-weight: 700;
-        }
-        .suggestion-box {
-            background-color: #fff;
-            border-left: 5px solid #2563eb;
-            padding: 15px;
-            border-radius: 8px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-        }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- HEADER ---
-st.markdown("""
-<div class='title-container'>
-    <h1>📊 Smart Quality Cost Monitoring Dashboard</h1>
-    <p>Analyze, track, and improve your quality costs using TQM principles & AI insights.</p>
-</div>
-""", unsafe_allow_html=True)
+
+# --- MIGRATION NOTICES (shown once per session) ---
+migration_error = st.session_state.pop("migration_error", None)
+if migration_error:
+    st.error(f"⚠️ Could not import {LEGACY_CSV_FILE} ({migration_error}); starting with an empty dataset.")
+migration_dropped = st.session_state.pop("migration_dropped", 0)
+if migration_dropped:
+    st.warning(f"⚠️ Skipped {migration_dropped} row(s) from {LEGACY_CSV_FILE} with an unknown month, "
+               "missing category or non-integer cost.")
+
+# --- CUSTOM CSS STYLING & HEADER ---
+st.markdown(STYLE_AND_HEADER, unsafe_allow_html=True)
 
 # --- SIDEBAR NAVIGATION ---
 st.sidebar.image("https://cdn-icons-png.flaticon.com/512/2966/2966484.png", width=80)
@@ -80,67 +156,164 @@ page = st.sidebar.radio(
 )
 st.sidebar.markdown("---")
 st.sidebar.caption("• TQM Project 2025")
+# --- PDF EXPORT ---
+# FPDF's core fonts only cover latin-1, so map common typographic characters to ASCII
+PDF_CHAR_MAP = str.maketrans({"₹": "Rs.", "’": "'", "‘": "'", "“": '"', "”": '"',
+                              "—": "-", "–": "-", "•": "-", "…": "..."})
+
+def build_pdf_report(report, cogq, copq, total_cost):
+    from fpdf import FPDF
+
+    # Anything still outside latin-1 becomes "?" instead of failing the export
+    safe_report = report.translate(PDF_CHAR_MAP).encode("latin-1", "replace").decode("latin-1")
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "Organization: XYZ Manufacturing Pvt. Ltd.", ln=True, align="C")
+    pdf.ln(5)
+
+    pdf.set_font("Arial", 'B', 13)
+    pdf.cell(0, 10, "KPI Summary:", ln=True)
+    pdf.set_font("Arial", '', 12)
+    pdf.multi_cell(0, 8,
+        f"COGQ: Rs.{cogq:,.0f}\n"
+        f"COPQ: Rs.{copq:,.0f}\n"
+        f"Total Cost: Rs.{total_cost:,.0f}\n"
+    )
+    pdf.ln(5)
+
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, "Monthly Quality Performance Report", ln=True, align="C")
+    pdf.ln(8)
+
+    pdf.set_font("Arial", '', 12)
+    today = datetime.date.today().strftime("%B %Y")
+    pdf.cell(0, 10, f"Date: {today}", ln=True)
+    pdf.ln(5)
+
+    pdf.multi_cell(0, 8,
+        f"COGQ: Rs.{cogq:,.0f}\n"
+        f"COPQ: Rs.{copq:,.0f}\n"
+        f"Total Cost: Rs.{total_cost:,.0f}\n"
+    )
+    pdf.ln(4)
+
+    pdf.set_font("Arial", 'B', 13)
+    pdf.cell(0, 10, "AI-Generated Insights:", ln=True)
+    pdf.set_font("Arial", '', 12)
+    pdf.multi_cell(0, 8, safe_report)
+    pdf.ln(5)
+
+    pdf.set_font("Arial", 'I', 11)
+    pdf.cell(0, 10, "Generated by Smart Quality Cost Monitoring Dashboard", ln=True, align="C")
+
+    # Render in memory instead of going through a file on disk
+    return pdf.output(dest="S").encode("latin-1")
+
 # --- OPENAI SETUP ---
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MAX_COMPLETION_TOKENS = 220
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def stream_to_box(stream, fmt=lambda text: text):
+    # Render the completion into a suggestion box as tokens arrive; returns the full text
+    box = st.empty()
+    text = ""
+    for chunk in stream:
+        if chunk.choices:
+            text += chunk.choices[0].delta.content or ""
+            box.markdown(f"<div class='suggestion-box'>{fmt(text)}</div>", unsafe_allow_html=True)
+    return text
+
+def format_suggestions(text):
+    return text.replace('*', '•')
+
+def generate_text(prompt, temperature, fmt=lambda text: text):
+    # Identical prompts (same data, same month) reuse the earlier answer instead of another paid call
+    key = hashlib.sha256(prompt.encode()).hexdigest()
+    cache = st.session_state.setdefault("llm_cache", {})
+    if key in cache:
+        st.markdown(f"<div class='suggestion-box'>{fmt(cache[key])}</div>", unsafe_allow_html=True)
+    else:
+        stream = get_openai_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=MAX_COMPLETION_TOKENS,  # bounds generation time
+            stream=True
+        )
+        cache[key] = stream_to_box(stream, fmt)
+    return cache[key]
 
-# --- INITIALIZE DATA ---
-if "data" not in st.session_state:
-    st.session_state["data"] = pd.DataFrame(columns=["Month", "Category", "Cost", "Description"])
-df = st.session_state["data"]
+# Each page is a fragment, so its widgets rerun only that page instead of the whole script.
+# Pages read session_state["data"] themselves so a fragment rerun sees newly added rows.
 
 # ============================================
 # PAGE 1: UPLOAD & ADD DATA
 # ============================================
-if page == "📂 Upload & Add Data":
+@st.fragment
+def upload_page():
     st.header("📤 Upload or Add Quality Cost Data")
+    row_hashes = st.session_state["row_hashes"]
 
     uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
     if uploaded_file is not None:
-        uploaded_df = pd.read_csv(uploaded_file)
-        # Merge with existing session data
-        df = pd.concat([st.session_state["data"], uploaded_df], ignore_index=True)
-        df = df.drop_duplicates().reset_index(drop=True)
-        st.session_state["data"] = df
-        df.to_csv(DATA_FILE, index=False)  # 🔹 save merged data
-        st.success("✅ File uploaded and merged successfully!")
-    else:
-        df = st.session_state["data"]
+        try:
+            uploaded_df = read_data_csv(uploaded_file).drop_duplicates()
+        except Exception as e:
+            st.error(f"Could not read the uploaded file: {e}")
+        else:
+            # Keep only rows we don't already have, then merge with existing session data
+            is_new = [row not in row_hashes for row in uploaded_df.itertuples(index=False, name=None)]
+            uploaded_df = uploaded_df[is_new]
+            if not uploaded_df.empty:
+                row_hashes.update(uploaded_df.itertuples(index=False, name=None))
+                df = pd.concat([st.session_state["data"], uploaded_df], ignore_index=True)
+                df["Month"] = df["Month"].astype(MONTH_DTYPE)
+                set_data(df)
+                save_data(df)  # 🔹 save merged data
+            st.success("✅ File uploaded and merged successfully!")
 
     st.markdown("### ➕ Add New Record")
     with st.form("add_record_form"):
-        month = st.selectbox("Month", ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"])
+        month = st.selectbox("Month", MONTH_ORDER)
         category = st.selectbox("Category", ["Prevention", "Appraisal", "Internal Failure", "External Failure"])
         cost = st.number_input("Cost (₹)", min_value=0)
         description = st.text_input("Description", placeholder="e.g. Training session, warranty claims...")
         submitted = st.form_submit_button("Add Record")
 
     if submitted:
-        new_entry = pd.DataFrame([[month, category, cost, description]], columns=["Month", "Category", "Cost", "Description"])
-        df = pd.concat([st.session_state["data"], new_entry], ignore_index=True)
-        df = df.drop_duplicates().reset_index(drop=True)
-        st.session_state["data"] = df
-        df.to_csv(DATA_FILE, index=False)  # 🔹 permanently save
-        
+        key = (month, category, cost, description)
+        if key not in row_hashes:
+            row_hashes.add(key)
+            new_entry = pd.DataFrame([key], columns=["Month", "Category", "Cost", "Description"])
+            df = pd.concat([st.session_state["data"], new_entry], ignore_index=True)
+            df["Month"] = df["Month"].astype(MONTH_DTYPE)
+            set_data(df)
+            save_data(df)  # 🔹 permanently save
+
         with st.spinner("Saving your record..."):
             time.sleep(0.5)
         st.success("✅ Record added successfully!")
-        df.to_csv("quality_data.csv", index=False)
 # ============================================
 # PAGE 2: DASHBOARD & KPIs
 # ============================================
-elif page == "📈 Dashboard & KPIs":
+@st.fragment
+def dashboard_page():
     st.header("📈 Quality Cost Dashboard")
+    set_chart_theme()
     df = st.session_state["data"]
+    data_key = st.session_state["data_key"]
     if not df.empty:
-        summary = df.groupby("Category")["Cost"].sum().reset_index()
+        sums = category_sums(data_key, df)
 
         st.subheader("📊 Key Quality Performance Indicators (KPIs)")
-        prevention = summary.loc[summary['Category']=='Prevention', 'Cost'].sum()
-        appraisal = summary.loc[summary['Category']=='Appraisal', 'Cost'].sum()
-        internal = summary.loc[summary['Category']=='Internal Failure', 'Cost'].sum()
-        external = summary.loc[summary['Category']=='External Failure', 'Cost'].sum()
-
-        COGQ, COPQ = prevention + appraisal, internal + external
+        COGQ, COPQ = quality_costs(sums)
         total = COGQ + COPQ
 
         col1, col2, col3 = st.columns(3)
@@ -148,38 +321,17 @@ elif page == "📈 Dashboard & KPIs":
         col2.metric("⚠️ Cost of Poor Quality", f"₹{COPQ:,.0f}")
         col3.metric("💰 Total Quality Cost", f"₹{total:,.0f}")
 
-        kpi_df = pd.DataFrame({"Category": ["Good Quality (COGQ)", "Poor Quality (COPQ)"],
-                               "Cost": [COGQ, COPQ]})
-        fig_kpi = px.bar(kpi_df, x="Category", y="Cost", color="Category",
-                         text_auto=True, title="COGQ vs COPQ Comparison",
-                         color_discrete_sequence=px.colors.qualitative.Safe)
+        fig_kpi = build_kpi_fig(COGQ, COPQ)
         st.plotly_chart(fig_kpi, use_container_width=True)
         st.session_state["fig_kpi"] = fig_kpi 
         st.subheader("🔹 Cost Breakdown by Category")
-        fig_pie = px.pie(summary, names="Category", values="Cost",
-                         color_discrete_sequence=px.colors.qualitative.Safe)
+        fig_pie = build_pie_fig(tuple(sums.keys()), tuple(sums.values()))
         st.plotly_chart(fig_pie, use_container_width=True)
 
         st.subheader("📉 Monthly Trend")
-        # Define correct month order
-        month_order = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-
-        monthly = (
-            df.groupby("Month")["Cost"]
-            .sum()
-            .reindex(month_order)        # Reorder rows by month
-            .reset_index()
-            .dropna(subset=["Cost"])     # Remove empty months
-        )
+        monthly = month_sums(data_key, df).reset_index()
 
-        fig_line = px.line(
-            monthly,
-            x="Month",
-            y="Cost",
-            markers=True,
-            title="Total Quality Cost per Month",
-            line_shape="linear"
-        )
+        fig_line = build_line_fig(tuple(monthly["Month"].astype(str)), tuple(monthly["Cost"].tolist()))
         st.plotly_chart(fig_line, use_container_width=True)
     else:
         st.warning("No data available. Please upload or add some records first.")
@@ -187,18 +339,21 @@ elif page == "📈 Dashboard & KPIs":
 # ============================================
 # PAGE 3: AI SUGGESTIONS
 # ============================================
-elif page == "🤖 AI Suggestions":
+@st.fragment
+def ai_suggestions_page():
     st.header("🧠 AI-Based Quality Improvement Suggestions")
+    df = st.session_state["data"]
+    data_key = st.session_state["data_key"]
 
     if df.empty:
         st.warning("Please upload or add data first.")
     else:
-        summary = df.groupby("Category")["Cost"].sum().reset_index()
+        sums = category_sums(data_key, df)
         summary_text = (
-            f"Prevention: ₹{summary.loc[summary['Category']=='Prevention', 'Cost'].sum()}, "
-            f"Appraisal: ₹{summary.loc[summary['Category']=='Appraisal', 'Cost'].sum()}, "
-            f"Internal Failure: ₹{summary.loc[summary['Category']=='Internal Failure', 'Cost'].sum()}, "
-            f"External Failure: ₹{summary.loc[summary['Category']=='External Failure', 'Cost'].sum()}."
+            f"Prevention: ₹{sums.get('Prevention', 0)}, "
+            f"Appraisal: ₹{sums.get('Appraisal', 0)}, "
+            f"Internal Failure: ₹{sums.get('Internal Failure', 0)}, "
+            f"External Failure: ₹{sums.get('External Failure', 0)}."
         )
 
         if st.button("Generate AI Suggestions"):
@@ -216,40 +371,38 @@ elif page == "🤖 AI Suggestions":
                 Format the response in clean bullet points with short reasoning for each suggestion.
                 """
             try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.6
-                )
-                suggestions = response.choices[0].message.content
                 st.markdown("---")
-                st.markdown(f"<div class='suggestion-box'>{suggestions.replace('*', '•')}</div>",
-                            unsafe_allow_html=True)
+                st.session_state["suggestions"] = generate_text(prompt, 0.6, format_suggestions)
+                st.session_state["suggestions_key"] = data_key  # lets the report reuse them
             except Exception as e:
                 st.error(f"Error: {e}")
 
 # ============================================
 # PAGE 4: REPORTS
 # ============================================
-elif page == "🧾 Reports":
+@st.fragment
+def reports_page():
     st.header("📋 AI-Generated Monthly Quality Report")
+    df = st.session_state["data"]
+    data_key = st.session_state["data_key"]
 
     if df.empty:
         st.warning("Please upload or add data first.")
     else:
-        summary = df.groupby("Category")["Cost"].sum().reset_index()
-        COGQ = summary.loc[summary['Category']=='Prevention', 'Cost'].sum() + summary.loc[summary['Category']=='Appraisal', 'Cost'].sum()
-        COPQ = summary.loc[summary['Category']=='Internal Failure', 'Cost'].sum() + summary.loc[summary['Category']=='External Failure', 'Cost'].sum()
+        sums = category_sums(data_key, df)
+        COGQ, COPQ = quality_costs(sums)
         total_cost = COGQ + COPQ
 
-        month_order = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
-        available_months = [m for m in month_order if m in df["Month"].unique()]
+        # Observed months, already in calendar order
+        available_months = list(month_sums(data_key, df).index)
         selected_month = st.selectbox("Select month for report", available_months)
 
         if st.button("Generate Monthly Report"):
-            month_data = df[df["Month"] == selected_month]
-            month_total = month_data["Cost"].sum()
-            month_trend = df.groupby("Month")["Cost"].sum().reset_index().tail(3)
+            # Compare integer category codes rather than month strings
+            code = MONTH_DTYPE.categories.get_loc(selected_month)
+            month_data = df[df["Month"].cat.codes.to_numpy() == code]
+            month_total = int(month_data["Cost"].to_numpy().sum())  # Cost is int64, skip pandas' NaN handling
+            month_trend = month_sums(data_key, df).tail(3).reset_index()
 
             summary_text = (
                 f"Report for {selected_month}:\n"
@@ -258,93 +411,85 @@ elif page == "🧾 Reports":
                 f"COGQ = ₹{COGQ:,.0f}, COPQ = ₹{COPQ:,.0f}, Total = ₹{total_cost:,.0f}."
             )
 
-            prompt = f"""
-            You are a Quality Manager preparing a report for {selected_month}.
-            Based on this data:
-            {summary_text}
+            # Suggestions already generated for this exact data become the report's recommendations,
+            # so the model only has to write the shorter performance narrative
+            suggestions = None
+            if st.session_state.get("suggestions_key") == data_key:
+                suggestions = st.session_state["suggestions"]
+
+            if suggestions:
+                prompt = f"""
+                You are a Quality Manager preparing a report for {selected_month}.
+                Based on this data:
+                {summary_text}
+
+                Write a short (around 100 words) report highlighting:
+                - This month’s quality cost performance
+                - Trend compared to previous months
+                Do not include recommendations; they are added separately.
+                Keep it professional, concise, and insights-focused.
+                """
+            else:
+                prompt = f"""
+                You are a Quality Manager preparing a report for {selected_month}.
+                Based on this data:
+                {summary_text}
+
+                Write a short (around 150 words) report highlighting:
+                - This month’s quality cost performance
+                - Trend compared to previous months
+                - Recommendations for improvement next month
+                Keep it professional, concise, and insights-focused.
+                """
 
-            Write a short (around 150 words) report highlighting:
-            - This month’s quality cost performance
-            - Trend compared to previous months
-            - Recommendations for improvement next month
-            Keep it professional, concise, and insights-focused.
-            """
+            def with_recommendations(text):
+                if not suggestions:
+                    return text
+                return f"{text}\n\nRecommendations for next month:\n{format_suggestions(suggestions)}"
 
             try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7
-                )
-                st.session_state["report"] = response.choices[0].message.content
+                st.session_state["report"] = with_recommendations(generate_text(prompt, 0.7, with_recommendations))
                 st.success("✅ Monthly report generated successfully!")
-                st.markdown(f"<div class='suggestion-box'>{st.session_state['report']}</div>", unsafe_allow_html=True)
             except Exception as e:
                 st.error(f"Error generating report: {e}")
 
         # --- PDF EXPORT ---
         st.subheader("📥 Export Monthly Quality Report")
 
-        if st.button("Download PDF Report"):
-            # Check if report exists
-            if "report" not in st.session_state:
-                st.warning("⚠️ Please generate the monthly report first.")
+        if "report" not in st.session_state:
+            st.info("ℹ️ Generate the monthly report first to export it as PDF.")
+        else:
+            # Rebuild the PDF only when the report text or the KPIs have changed
+            pdf_fp = hash((st.session_state["report"], COGQ, COPQ, total_cost))
+            if st.session_state.get("pdf_fp") != pdf_fp:
+                try:
+                    st.session_state.update(
+                        pdf_fp=pdf_fp,
+                        pdf_bytes=build_pdf_report(st.session_state["report"], COGQ, COPQ, total_cost),
+                        pdf_error=None
+                    )
+                except Exception as e:
+                    # Remember the failure too, so reruns don't retry the same content
+                    st.session_state.update(pdf_fp=pdf_fp, pdf_bytes=None, pdf_error=str(e))
+
+            if st.session_state["pdf_bytes"] is None:
+                st.error(f"Error creating PDF: {st.session_state['pdf_error']}")
             else:
-                # Replace ₹ with Rs for compatibility
-                st.session_state["report"] = st.session_state["report"].replace("₹", "Rs.")
-                safe_report = st.session_state["report"]
-
-                # --- Create PDF ---
-                pdf = FPDF()
-                pdf.add_page()
-
-                pdf.set_font("Arial", 'B', 14)
-                pdf.cell(0, 10, "Organization: XYZ Manufacturing Pvt. Ltd.", ln=True, align="C")
-                pdf.ln(5)
-
-                pdf.set_font("Arial", 'B', 13)
-                pdf.cell(0, 10, "KPI Summary:", ln=True)
-                pdf.set_font("Arial", '', 12)
-                pdf.multi_cell(0, 8,
-                    f"COGQ: Rs.{COGQ:,.0f}\n"
-                    f"COPQ: Rs.{COPQ:,.0f}\n"
-                    f"Total Cost: Rs.{total_cost:,.0f}\n"
-                )
-                pdf.ln(5)
-
-                pdf.set_font("Arial", 'B', 16)
-                pdf.cell(0, 10, "Monthly Quality Performance Report", ln=True, align="C")
-                pdf.ln(8)
-
-                pdf.set_font("Arial", '', 12)
-                today = datetime.date.today().strftime("%B %Y")
-                pdf.cell(0, 10, f"Date: {today}", ln=True)
-                pdf.ln(5)
-
-                pdf.multi_cell(0, 8,
-                f"COGQ: Rs.{COGQ:,.0f}\n"
-                f"COPQ: Rs.{COPQ:,.0f}\n"
-                f"Total Cost: Rs.{total_cost:,.0f}\n"
-                )
-                pdf.ln(4)
-
-            pdf.set_font("Arial", 'B', 13)
-            pdf.cell(0, 10, "AI-Generated Insights:", ln=True)
-            pdf.set_font("Arial", '', 12)
-            pdf.multi_cell(0, 8, safe_report)
-            pdf.ln(5)
-
-            pdf.set_font("Arial", 'I', 11)
-            pdf.cell(0, 10, "Generated by Smart Quality Cost Monitoring Dashboard", ln=True, align="C")
-
-            # --- Save & Provide Download ---
-            pdf.output("Monthly_Quality_Report.pdf")
-            with open("Monthly_Quality_Report.pdf", "rb") as f:
                 st.download_button(
                     label="📄 Download PDF Report",
-                    data=f,
+                    data=st.session_state["pdf_bytes"],
                     file_name="Monthly_Quality_Report.pdf",
                     mime="application/pdf"
                 )
 
-
+# ============================================
+# PAGE DISPATCH
+# ============================================
+if page == "📂 Upload & Add Data":
+    upload_page()
+elif page == "📈 Dashboard & KPIs":
+    dashboard_page()
+elif page == "🤖 AI Suggestions":
+    ai_suggestions_page()
+elif page == "🧾 Reports":
+    reports_page()